@@ -1,3 +1,8 @@
+try:
+    import ahocorasick  # Optional: pip install pyahocorasick
+except ImportError:
+    ahocorasick = None
+
 BINARY_EXTENSIONS = [
     # Compiled executables and libraries
     ".exe",
@@ -12,6 +17,8 @@ BINARY_EXTENSIONS = [
     ".zip",
     ".tar",
     ".tar.gz",
+    ".tar.bz2",
+    ".tar.xz",
     ".tgz",
     ".rar",
     ".7z",
@@ -136,10 +143,7 @@ BINARY_EXTENSIONS = [
     ".snupkg",
     ".appx",
     ".msix",
-    ".msp",
     ".msu",
-    ".deb",
-    ".rpm",
     ".snap",
     ".flatpak",
     ".appimage",
@@ -152,7 +156,6 @@ BINARY_EXTENSIONS = [
     ".rlib",
     ".pdb",
     ".idb",
-    ".pdb",
     ".dbg",
     ".sdf",
     ".bak",
@@ -184,3 +187,31 @@ BINARY_EXTENSIONS = [
     ".gitignore",
     ".gitkeep",
 ]
+
+# Lookup tables built once at import so the per-file check is a hash lookup
+# instead of a scan over every entry above. The set is keyed by the suffix
+# from the last dot, so multi-dot entries like .tar.gz are kept in a tuple
+# for a single str.endswith() call.
+BINARY_EXT_SET = frozenset(
+    e.lower() for e in BINARY_EXTENSIONS if e.startswith(".") and e.count(".") == 1
+)
+BINARY_MULTI_EXT_TUPLE = tuple(
+    e.lower() for e in BINARY_EXTENSIONS if e.startswith(".") and e.count(".") > 1
+)
+BINARY_NAME_SET = frozenset(
+    e.lower() for e in BINARY_EXTENSIONS if not e.startswith(".")
+)
+
+# With pyahocorasick installed, every entry is compiled into one automaton so
+# a file name is classified in a single C-level pass. Names are probed as
+# "\0name\0": suffix entries are stored as "<ext>\0" and whole-name entries as
+# "\0<name>\0", so only matches anchored at the end of the name count.
+BINARY_AUTOMATON = None
+if ahocorasick is not None:
+    BINARY_AUTOMATON = ahocorasick.Automaton()
+    for _entry in BINARY_EXTENSIONS:
+        _word = _entry.lower() + "\0"
+        if not _entry.startswith("."):
+            _word = "\0" + _word
+        BINARY_AUTOMATON.add_word(_word, _entry)
+    BINARY_AUTOMATON.make_automaton()
@@ -1,32 +1,56 @@
 #!/usr/bin/env python3
 import os
-from github import Github
+import asyncio
+import base64
+import functools
+import mmap
+import shutil
+import subprocess
+import sys
+import tarfile
+import tempfile
 from pathlib import Path
-import pyperclip
 import typer
 from rich.console import Console
 from dotenv import load_dotenv
 import datetime
 from tqdm import tqdm
-from bin_ext import BINARY_EXTENSIONS
+from bin_ext import (
+    BINARY_AUTOMATON,
+    BINARY_EXT_SET,
+    BINARY_MULTI_EXT_TUPLE,
+    BINARY_NAME_SET,
+)
 import json
-from typing import Optional
+import re
+from typing import Callable, Optional
+from urllib.parse import quote
 import fnmatch
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager, suppress
+from dataclasses import dataclass
 
-load_dotenv()
+# GitHub, aiohttp, requests and pyperclip are imported where they are used, so local runs
+# don't pay for loading them at startup.
+if not os.getenv("SKIP_DOTENV"):
+    load_dotenv()
 
-try:
-    GITHUB_TOKEN = os.environ["GITHUB_TOKEN"]
-except KeyError:
-    GITHUB_TOKEN = None
-    print("Warning: GitHub Personal Access Token not found in environment variables.")
-    print("You will only be able to convert local repositories")
-
-BINARY_EXTENSIONS = set(BINARY_EXTENSIONS)  # Convert to set for efficient lookup
 # -------------------------------------------------------------------------------------------------
 app = typer.Typer()
 console = Console()
 
+GITHUB_API_URL = "https://api.github.com"
+MAX_CONCURRENT_REQUESTS = 32  # Upper bound on in-flight GitHub API requests
+MAX_PENDING_READS = 64  # Local files read ahead of the output writer
+# Reads release the GIL, so size the pool for in-flight I/O rather than cores
+MAX_READ_WORKERS = min(32, (os.cpu_count() or 1) * 4)
+OUTPUT_BUFFER_SIZE = 1 << 20  # 1 MiB write buffer for the output file
+BINARY_PROBE_SIZE = 8192  # Leading bytes checked for NUL, as git does
+MMAP_THRESHOLD = 1 << 20  # Local files above 1 MiB are read through mmap
+# Tree ETags and tarballs from the GitHub API fallback are kept here
+CACHE_DIR = Path(os.getenv("XDG_CACHE_HOME") or Path.home() / ".cache") / "repototxt"
+
 
 def read_config(config_path: str = "config.json") -> dict:
     """
@@ -42,15 +66,42 @@ def read_config(config_path: str = "config.json") -> dict:
     return config
 
 
-CONFIG = read_config()
+@dataclass(frozen=True, slots=True)
+class Settings:
+    """
+    Configuration resolved once at startup from config.json and the environment.
+    """
+
+    github_token: Optional[str]
+    output_directory: Path
+    save_to_file: bool
+    copy_to_clipboard: bool
+    timestamp_option: bool
+    max_file_bytes: int  # Local files larger than this are skipped
 
 
-def get_config_value(key: str, default: Optional[bool] = None) -> Optional[bool]:
+def load_settings(config_path: str = "config.json") -> Settings:
     """
-    Helper function to fetch a configuration value given its key,
-    with an optional default if the key doesn't exist.
+    Build the Settings from config.json and the environment, applying defaults for missing keys.
     """
-    return CONFIG.get(key, default)
+    config = read_config(config_path)
+    return Settings(
+        github_token=os.environ.get("GITHUB_TOKEN"),
+        output_directory=Path(config.get("output_directory", "./")),
+        save_to_file=config.get("save_to_file", True),
+        copy_to_clipboard=config.get("copy_to_clipboard", True),
+        timestamp_option=config.get("timestamp_option", True),
+        max_file_bytes=config.get("max_file_bytes", 5 * 1024 * 1024),
+    )
+
+
+SETTINGS = load_settings()
+
+if not SETTINGS.github_token:
+    print("Warning: GitHub Personal Access Token not found in environment variables.")
+    print(
+        "You will only be able to convert local repositories and, with git installed, public GitHub repositories"
+    )
 
 
 def is_github_repo_url(input_path: str) -> bool:
@@ -64,42 +115,255 @@ def extract_repo_path(repo_url: str) -> str:
     return parts[1] if len(parts) == 2 else ""
 
 
-def parse_ignore_patterns(directory_path: str) -> list:
+IgnoreRules = namedtuple("IgnoreRules", ["name", "dir_name", "path", "dir_path"])
+
+
+def _compile_patterns(translated: list) -> re.Pattern:
+    if not translated:
+        return re.compile(r"(?!)")  # Never matches
+    return re.compile("|".join(f"(?:{regex})" for regex in translated))
+
+
+def _translate_path_pattern(pattern: str) -> str:
+    """
+    Translate a slash pattern to a regex with gitignore's wildcard rules:
+    * and ? never match "/", and a ** segment matches zero or more directories.
+    """
+    segments = pattern.split("/")
+    regex = []
+    for index, segment in enumerate(segments):
+        last = index == len(segments) - 1
+        if segment == "**":
+            regex.append(".*" if last else "(?:[^/]*/)*")
+            continue
+        i = 0
+        while i < len(segment):
+            char = segment[i]
+            i += 1
+            if char == "*":
+                regex.append("[^/]*")
+            elif char == "?":
+                regex.append("[^/]")
+            elif char == "\\" and i < len(segment):
+                regex.append(re.escape(segment[i]))
+                i += 1
+            elif char == "[":
+                end = i + 1 if segment[i : i + 1] in ("!", "^") else i
+                end = segment.find("]", end + 1)
+                if end == -1:
+                    regex.append(r"\[")
+                    continue
+                body = segment[i:end].replace("\\", "\\\\")
+                if body[:1] in ("!", "^"):
+                    body = "^" + body[1:]
+                regex.append(f"[{body}]")
+                i = end + 1
+            else:
+                regex.append(re.escape(char))
+        if not last:
+            regex.append("/")
+    return "".join(regex) + r"\Z"
+
+
+@functools.lru_cache(maxsize=32)
+def parse_ignore_patterns(directory_path: str) -> IgnoreRules:
     """
     Parses both .gitignore and .gptignore files in the provided directory,
-    returns a list of patterns to ignore. Patterns in .gptignore take precedence.
+    returns IgnoreRules holding compiled regexes for the patterns to ignore.
+    Patterns in .gptignore take precedence. As in gitignore, a pattern with a
+    leading or inner slash is anchored and matched against the relative path,
+    any other pattern is matched against the name at every depth, and a
+    trailing slash restricts a pattern to directories. In slash patterns * stops
+    at "/" and ** spans whole directories. The dir_name and
+    dir_path regexes include the patterns that apply to all entries.
     """
     ignore_files = [".gitignore", ".gptignore"]
     ignore_patterns = []
 
     for ignore_file in ignore_files:
         try:
-            with open(os.path.join(directory_path, ignore_file), "r") as f:
-                for line in f:
-                    cleaned_line = line.strip()
-                    if cleaned_line and not cleaned_line.startswith("#"):
-                        ignore_patterns.append(cleaned_line)
+            lines = (
+                Path(directory_path, ignore_file)
+                .read_text(errors="ignore")
+                .splitlines()
+            )
         except FileNotFoundError:
-            pass  # Ignore the error if the file does not exist
+            continue  # Ignore the error if the file does not exist
+        for line in lines:
+            cleaned_line = line.strip()
+            if cleaned_line and not cleaned_line.startswith("#"):
+                ignore_patterns.append(cleaned_line)
 
     if not ignore_patterns:
         ignore_patterns.extend([".git", ".gitignore", "**/.env"])
 
-    return list(set(ignore_patterns))  # remove duplicates
-
+    # Remove duplicates, keeping the first occurrence in file order
+    ignore_patterns = list(dict.fromkeys(ignore_patterns))
+
+    name_patterns = []
+    dir_name_patterns = []
+    path_patterns = []
+    dir_path_patterns = []
+    for pattern in ignore_patterns:
+        dir_only = pattern.endswith("/")
+        pattern = pattern.rstrip("/")
+        if pattern.startswith("**/") and "/" not in pattern[3:]:
+            pattern = pattern[3:]  # Same as a bare name at any depth
+        if not pattern:
+            continue
+        if "/" in pattern:
+            target = dir_path_patterns if dir_only else path_patterns
+            target.append(_translate_path_pattern(pattern.lstrip("/")))
+        else:
+            target = dir_name_patterns if dir_only else name_patterns
+            target.append(fnmatch.translate(pattern))
+
+    return IgnoreRules(
+        _compile_patterns(name_patterns),
+        _compile_patterns(name_patterns + dir_name_patterns),
+        _compile_patterns(path_patterns),
+        _compile_patterns(path_patterns + dir_path_patterns),
+    )
+
+
+def is_binary_file(name_lc: str) -> bool:
+    """
+    Case-insensitive check of a lower-cased file name against the binary
+    extension and whole-name tables from bin_ext.
+    """
+    if BINARY_AUTOMATON is not None:
+        return next(BINARY_AUTOMATON.iter(f"\0{name_lc}\0"), None) is not None
+    return (
+        # Without a dot the slice is the last character, which never matches
+        # because every set entry starts with "."
+        name_lc[name_lc.rfind(".") :] in BINARY_EXT_SET
+        or name_lc.endswith(BINARY_MULTI_EXT_TUPLE)
+        or name_lc in BINARY_NAME_SET
+    )
+
+
+def _clipboard_command() -> Optional[list]:
+    """
+    Return the platform clipboard tool that reads UTF-8 text from stdin, if any.
+    """
+    if sys.platform == "darwin":
+        return ["pbcopy"]
+    if os.getenv("WAYLAND_DISPLAY") and shutil.which("wl-copy"):
+        return ["wl-copy"]
+    if shutil.which("xclip"):
+        return ["xclip", "-selection", "clipboard"]
+    if shutil.which("xsel"):
+        return ["xsel", "--clipboard", "--input"]
+    return None
+
+
+def _win32_copy(text: str) -> bool:
+    """
+    Place text on the Windows clipboard as CF_UNICODETEXT through user32 and
+    kernel32 directly, without a subprocess.
+    """
+    import ctypes
+    from ctypes import wintypes
+
+    kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+    user32 = ctypes.WinDLL("user32", use_last_error=True)
+    kernel32.GlobalAlloc.argtypes = [wintypes.UINT, ctypes.c_size_t]
+    kernel32.GlobalAlloc.restype = wintypes.HGLOBAL
+    kernel32.GlobalLock.argtypes = [wintypes.HGLOBAL]
+    kernel32.GlobalLock.restype = wintypes.LPVOID
+    kernel32.GlobalUnlock.argtypes = [wintypes.HGLOBAL]
+    kernel32.GlobalFree.argtypes = [wintypes.HGLOBAL]
+    user32.OpenClipboard.argtypes = [wintypes.HWND]
+    user32.SetClipboardData.argtypes = [wintypes.UINT, wintypes.HANDLE]
+    user32.SetClipboardData.restype = wintypes.HANDLE
+
+    GMEM_MOVEABLE = 0x0002
+    CF_UNICODETEXT = 13
+    data = text.encode("utf-16-le") + b"\0\0"
+    if not user32.OpenClipboard(None):
+        return False
+    try:
+        user32.EmptyClipboard()
+        handle = kernel32.GlobalAlloc(GMEM_MOVEABLE, len(data))
+        if not handle:
+            return False
+        locked = kernel32.GlobalLock(handle)
+        if not locked:
+            kernel32.GlobalFree(handle)
+            return False
+        ctypes.memmove(locked, data, len(data))
+        kernel32.GlobalUnlock(handle)
+        if not user32.SetClipboardData(CF_UNICODETEXT, handle):
+            kernel32.GlobalFree(handle)
+            return False
+        return True  # The clipboard owns the memory from here on
+    finally:
+        user32.CloseClipboard()
+
+
+def copy_to_clipboard(data: bytes | bytearray):
+    """
+    Copy UTF-8 encoded output to the clipboard through the platform tool or
+    the Windows clipboard API, falling back to pyperclip.
+    """
+    copied = False
+    if sys.platform == "win32":
+        copied = _win32_copy(str(data, "utf-8"))
+    else:
+        command = _clipboard_command()
+        if command is not None:
+            try:
+                subprocess.run(
+                    command,
+                    input=data,
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.DEVNULL,
+                    env=dict(os.environ, LC_CTYPE="UTF-8"),  # pbcopy reads the locale
+                    check=True,
+                )
+                copied = True
+            except (OSError, subprocess.CalledProcessError):
+                pass
+    if not copied:
+        import pyperclip
 
-def copy_to_clipboard(text: str):
-    pyperclip.copy(text)
+        pyperclip.copy(str(data, "utf-8"))
     console.print("[green]Text copied to clipboard![/green]")
 
 
-def save_to_file(text: str, filename: str, output_dir: Path, timestamp_option: bool):
+@contextmanager
+def save_to_file(filename: str, output_dir: Path, timestamp_option: bool):
+    """
+    Yield a write function that streams UTF-8 encoded output to disk through a
+    1 MiB buffer. The output goes to a .part file that replaces the target only
+    on success, so a failed run leaves no empty or truncated file behind.
+    """
     output_filename = f"{filename}.txt"
     if timestamp_option:
         output_filename = f"{filename}_{get_timestamp()}.txt"
     output_file_path = output_dir.joinpath(output_filename)
-    with open(output_file_path, "w") as file:
-        file.write(text)
+    partial_file_path = output_dir.joinpath(f"{output_filename}.part")
+    file = None
+
+    def write(data):
+        nonlocal file
+        if file is None:
+            # Opened on the first write, after get_text has walked the
+            # repository, so an output directory inside it never lists this file
+            file = stack.enter_context(
+                open(partial_file_path, "wb", buffering=OUTPUT_BUFFER_SIZE)
+            )
+        file.write(data)
+
+    try:
+        with ExitStack() as stack:
+            yield write
+            if file is None:
+                write(b"")
+    except BaseException:
+        partial_file_path.unlink(missing_ok=True)
+        raise
+    os.replace(partial_file_path, output_file_path)
     console.print(f"[green]Text saved to file: {output_file_path}[/green]")
 
 
@@ -109,23 +373,30 @@ def get_timestamp():
     return timestamp
 
 
-def get_readme_content(repo):
+def get_readme_content(remote_repo):
     """
     Retrieve the content of the README file.
     """
     try:
-        readme = repo.get_contents("README.md")
-        return readme.decoded_content.decode("utf-8")
+        raw = remote_repo.repo.get_contents("README.md").decoded_content
+        return raw.decode("utf-8", errors="replace")
     except:
         return "README not found."
 
 
-def get_local_readme_content(path):
+def get_local_readme_content(local_repo):
     """
     Retrieve the content of the README file in a local directory.
     Improved error handling and consistency in parameter naming.
     """
-    readme_path = os.path.join(path, "README.md")
+    readme_path = os.path.join(local_repo.path, "README.md")
+    if local_repo.remote:
+        # Decode like get_readme_content, so clones match the API path
+        try:
+            with open(readme_path, "rb") as readme_file:
+                return readme_file.read().decode("utf-8", errors="replace")
+        except OSError:
+            return "README not found."
     if os.path.exists(readme_path):
         try:
             with open(readme_path, "r", encoding="utf-8") as readme_file:
@@ -136,225 +407,644 @@ def get_local_readme_content(path):
         return "README not found."
 
 
-def get_repo_structure(repo):
+def _github_headers(accept: str = "application/vnd.github+json") -> dict:
+    headers = {"Accept": accept}
+    if SETTINGS.github_token:
+        headers["Authorization"] = f"token {SETTINGS.github_token}"
+    return headers
+
+
+def _github_session():
     """
-    Traverse the repository iteratively to avoid recursion limits for large repositories.
+    Create an aiohttp session with a keep-alive connection pool sized to the
+    request semaphore, so TLS handshakes and DNS lookups are amortized across
+    every request made through it.
     """
-    structure = ""
-    dirs_to_visit = [("", repo.get_contents(""))]
-    dirs_visited = set()
+    import aiohttp
 
-    while dirs_to_visit:
-        path, contents = dirs_to_visit.pop()
-        dirs_visited.add(path)
-        for content in tqdm(contents, desc=f"Processing {path}", leave=False):
-            if content.type == "dir" and content.path not in dirs_visited:
-                structure += f"{path}/{content.name}/\n"
-                dirs_to_visit.append(
-                    (f"{path}/{content.name}", repo.get_contents(content.path))
-                )
-            else:
-                structure += f"{path}/{content.name}\n"
-    return structure
+    connector = aiohttp.TCPConnector(limit=MAX_CONCURRENT_REQUESTS, ttl_dns_cache=300)
+    return aiohttp.ClientSession(headers=_github_headers(), connector=connector)
 
 
-def get_local_repo_structure(path):
+async def _walk_contents(
+    session, semaphore, pbar, full_name: str, ref: str, path: str = ""
+) -> list:
     """
-    Generate the structure of a local directory, excluding the .git folder, README file and accounting for .gptignore.
+    List a directory through the Contents API and descend into its
+    subdirectories concurrently. Entries are returned in pre-order, each
+    directory followed by everything below it. A single shared progress bar
+    is advanced by each directory's entry count.
     """
-    ignore_patterns = parse_ignore_patterns(path)
-    print(ignore_patterns)
-    structure = ""
-    for root, dirs, files in os.walk(path):
-        dirs[:] = [
-            d
-            for d in dirs
-            if d != ".git"
-            and not any(fnmatch.fnmatch(d, pattern) for pattern in ignore_patterns)
-        ]
-        files = [
-            f
-            for f in files
-            if not any(
-                fnmatch.fnmatch(os.path.join(root, f), pattern)
-                for pattern in ignore_patterns
-            )
-        ]
+    url = f"{GITHUB_API_URL}/repos/{full_name}/contents/{quote(path)}?ref={ref}"
+    async with semaphore:
+        async with session.get(url) as response:
+            response.raise_for_status()
+            contents = await response.json()
+    pbar.update(len(contents))
+
+    subtrees = await asyncio.gather(
+        *(
+            _walk_contents(session, semaphore, pbar, full_name, ref, content["path"])
+            for content in contents
+            if content["type"] == "dir"
+        )
+    )
+    subtrees = iter(subtrees)
 
-        for dir_name in dirs:
-            relative_path = os.path.relpath(os.path.join(root, dir_name), path)
-            structure += f"{relative_path}/\n"
+    entries = []
+    for content in contents:
+        entries.append(content)
+        if content["type"] == "dir":
+            entries.extend(next(subtrees))
+    return entries
 
-        for file_name in files:
-            relative_path = os.path.relpath(os.path.join(root, file_name), path)
-            structure += f"{relative_path}\n"
-    return structure
 
+async def _list_repo_contents(full_name: str, ref: str) -> list:
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+    async with _github_session() as session:
+        with tqdm(desc="Traversing", unit="entry", leave=False) as pbar:
+            return await _walk_contents(session, semaphore, pbar, full_name, ref)
 
-def get_file_contents(repo):
-    file_contents_list = []  # Use a list to improve string building efficiency
-    dirs_to_visit = [("", repo.get_contents(""))]
-    dirs_visited = set()
 
-    while dirs_to_visit:
-        path, contents = dirs_to_visit.pop()
-        dirs_visited.add(path)
-        for content in tqdm(contents, desc=f"Downloading {path}", leave=False):
-            if content.type == "dir" and content.path not in dirs_visited:
-                dirs_to_visit.append(
-                    (f"{path}/{content.name}", repo.get_contents(content.path))
-                )
+def _cache_path(kind: str, name: str) -> Optional[Path]:
+    """
+    Return the path for name under CACHE_DIR/kind, creating the directory,
+    or None when the cache directory cannot be created.
+    """
+    directory = CACHE_DIR / kind
+    try:
+        directory.mkdir(parents=True, exist_ok=True)
+    except OSError:
+        return None
+    return directory / name
+
+
+def _read_cache(cache_file: Optional[Path]) -> Optional[dict]:
+    if cache_file is None or not cache_file.is_file():
+        return None
+    try:
+        return json.loads(cache_file.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None  # Unreadable or corrupt, rewritten by the caller
+
+
+def _write_cache(cache_file: Optional[Path], data: dict, stale_glob: str = ""):
+    if cache_file is None:
+        return
+    try:
+        if stale_glob:
+            for stale_file in cache_file.parent.glob(stale_glob):
+                stale_file.unlink(missing_ok=True)
+        cache_file.write_text(json.dumps(data), encoding="utf-8")
+    except OSError:
+        pass  # Caching is best effort
+
+
+async def _fetch_tree(full_name: str, ref: str) -> tuple:
+    """
+    Resolve ref to a commit SHA and fetch that commit's whole tree with one
+    recursive Git Trees request, returning (commit SHA, tree). The ref lookup
+    is cached with its ETag and revalidated with If-None-Match, so an
+    unchanged branch costs a 304 with no body; trees are cached under the
+    commit SHA, which never changes, so they are not requested again.
+    """
+    repo_key = full_name.replace("/", "@")
+    ref_cache = _cache_path("refs", f"{repo_key}@{quote(ref, safe='')}.json")
+    cached_ref = _read_cache(ref_cache)
+
+    headers = {"Accept": "application/vnd.github.sha"}
+    if cached_ref:
+        headers["If-None-Match"] = cached_ref["etag"]
+    async with _github_session() as session:
+        url = f"{GITHUB_API_URL}/repos/{full_name}/commits/{quote(ref)}"
+        async with session.get(url, headers=headers) as response:
+            if cached_ref and response.status == 304:
+                commit_sha = cached_ref["sha"]
             else:
-                # Skip README files
-                if content.name.lower() == "readme.md":
-                    continue
+                response.raise_for_status()
+                commit_sha = (await response.text()).strip()
+                etag = response.headers.get("ETag")
+                if etag:
+                    _write_cache(ref_cache, {"etag": etag, "sha": commit_sha})
+
+        tree_cache = _cache_path("trees", f"{repo_key}@{commit_sha}.json")
+        git_tree = _read_cache(tree_cache)
+        if git_tree is None:
+            url = (
+                f"{GITHUB_API_URL}/repos/{full_name}/git/trees/{commit_sha}?recursive=1"
+            )
+            async with session.get(url) as response:
+                response.raise_for_status()
+                git_tree = await response.json()
+            # Only the latest tree of each repository is kept
+            _write_cache(tree_cache, git_tree, f"{repo_key}@*.json")
+    return commit_sha, git_tree
 
-                content_descriptor = f"File: {path}/{content.name}\n"
-                if any(
-                    content.name.endswith(ext) for ext in BINARY_EXTENSIONS
-                ):  # Efficient lookup
-                    file_contents_list.append(
-                        content_descriptor + "Content: Skipped binary file\n\n"
-                    )
-                else:
-                    # Only construct the content string if needed
-                    content_string = "Content: "
-                    try:
-                        decoded_content = content.decoded_content.decode("utf-8")
-                        content_string += f"\n{decoded_content}\n\n"
-                    except UnicodeDecodeError:
-                        content_string += "Skipped due to unsupported encoding\n\n"
-                    except AttributeError:
-                        content_string += "Skipped due to decoding error or missing decoded_content\n\n"
 
-                    file_contents_list.append(content_descriptor + content_string)
-    return "".join(file_contents_list)  # Join the list into a single string at the end
+def _remote_content_section(raw) -> str:
+    """
+    Format downloaded file bytes as a Content section. The bytes are decoded
+    in memory once, falling back to Latin-1 like local files instead of
+    skipping them.
+    """
+    try:
+        decoded_content = str(raw, "utf-8")
+    except UnicodeDecodeError:
+        return f"Content (Latin-1 Decoded): \n{str(raw, 'latin-1')}\n\n"
+    return f"Content: \n{decoded_content}\n\n"
 
 
-def get_local_file_contents(path):
+def _iter_tarball_members(fileobj):
     """
-    Generate the contents of files in a local directory, excluding the .git folder, README file and  also accounting for .gptignore.
+    Yield (path, size, file object) for each regular file in a gzipped tar stream.
+    """
+    with tarfile.open(fileobj=fileobj, mode="r|gz") as tf:
+        for member in tf:
+            if member.isfile():
+                # Drop the "<owner>-<repo>-<sha>/" prefix GitHub adds
+                path = member.name.split("/", 1)[-1]
+                yield path, member.size, tf.extractfile(member)
+
+
+def _iter_repo_tarball(full_name: str, commit_sha: str):
+    """
+    Download the repository at commit_sha as a single tarball and stream it through
+    tarfile, yielding (path, size, file object) for every regular file in
+    archive order. The file object is only readable until the next item is
+    requested, so callers that skip a file never read its data.
+    The commit is the one the tree was resolved from, so the listing and the
+    contents always agree. Tarballs are cached on disk under that commit SHA,
+    so a rerun on an unchanged branch skips the download; only the latest
+    tarball of each repository is kept.
+    """
+    import requests
+
+    url = f"{GITHUB_API_URL}/repos/{full_name}/tarball/{commit_sha}"
+    repo_key = full_name.replace("/", "@")
+    cache_file = _cache_path("tarballs", f"{repo_key}@{commit_sha}.tar.gz")
+    cached = None
+    if cache_file is not None:
+        try:
+            if not cache_file.is_file():
+                _download_to_cache(url, cache_file, f"{repo_key}@*.tar.gz")
+            cached = open(cache_file, "rb")
+        except requests.RequestException:
+            raise
+        except OSError:
+            cached = None  # Caching is best effort, stream it instead
+
+    if cached is not None:
+        with cached:
+            yield from _iter_tarball_members(cached)
+        return
+
+    with requests.get(url, headers=_github_headers(), stream=True) as response:
+        response.raise_for_status()
+        yield from _iter_tarball_members(response.raw)
+
+
+def _download_to_cache(url: str, cache_file: Path, stale_glob: str):
+    """
+    Download url into cache_file through a .part file, replacing the other
+    cache files matching stale_glob once the download is complete.
+    """
+    import requests
+
+    partial_file = cache_file.with_suffix(".part")
+    try:
+        with requests.get(url, headers=_github_headers(), stream=True) as response:
+            response.raise_for_status()
+            with open(partial_file, "wb") as f:
+                shutil.copyfileobj(response.raw, f, OUTPUT_BUFFER_SIZE)
+        for stale_file in cache_file.parent.glob(stale_glob):
+            stale_file.unlink(missing_ok=True)
+        os.replace(partial_file, cache_file)
+    except BaseException:
+        with suppress(OSError):
+            partial_file.unlink(missing_ok=True)
+        raise
+
+
+RemoteRepo = namedtuple("RemoteRepo", ["repo", "truncated", "tree", "sha"])
+
+
+def _clone_repo(full_name: str, directory: str) -> bool:
+    """
+    Shallow-clone a GitHub repository into directory with the git CLI, so the
+    whole checkout arrives as one pack instead of through the API. The token,
+    when set, is sent as an HTTP header through git's environment config
+    rather than on the command line. Returns False when git is unavailable or
+    the clone fails, so the caller can fall back to the API.
     """
-    ignore_patterns = parse_ignore_patterns(path)
-    file_contents_list = []
+    git = shutil.which("git")
+    if git is None:
+        return False
+
+    env = dict(os.environ, GIT_TERMINAL_PROMPT="0")
+    if SETTINGS.github_token:
+        credentials = base64.b64encode(
+            f"x-access-token:{SETTINGS.github_token}".encode()
+        ).decode()
+        env.update(
+            GIT_CONFIG_COUNT="1",
+            GIT_CONFIG_KEY_0="http.https://github.com/.extraHeader",
+            GIT_CONFIG_VALUE_0=f"Authorization: Basic {credentials}",
+        )
+
+    print(f"Cloning: {full_name}")
+    result = subprocess.run(
+        [
+            git,
+            "clone",
+            "--config",
+            "core.autocrlf=false",  # Check out the same bytes as the tarball
+            "--depth",
+            "1",
+            "-q",
+            f"https://github.com/{full_name}.git",
+            directory,
+        ],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    if result.returncode != 0:
+        print(
+            f"git clone failed, falling back to the GitHub API: {result.stderr.strip()}"
+        )
+        return False
+    return True
+
+
+def walk_remote(repo):
+    """
+    Fetch the recursive tree of a GitHub repository once, so the structure
+    listing and the file downloads share it. Tree entries are (path, type)
+    tuples; RemoteRepo.sha is the commit the tree was resolved from.
+    """
+    commit_sha, git_tree = asyncio.run(_fetch_tree(repo.full_name, repo.default_branch))
+    tree = [(element["path"], element["type"]) for element in git_tree["tree"]]
+    return RemoteRepo(repo, git_tree.get("truncated", False), tree, commit_sha)
+
 
-    for root, dirs, files in os.walk(path):
-        dirs[:] = [
-            d
-            for d in dirs
-            if d != ".git"
-            and not any(fnmatch.fnmatch(d, pattern) for pattern in ignore_patterns)
+def get_repo_structure(remote_repo):
+    """
+    List the whole repository from its recursive Git Trees listing.
+    Falls back to the concurrent Contents API walk when GitHub truncates the tree.
+    """
+    if remote_repo.truncated:
+        entries = [
+            (content["path"], content["type"] == "dir")
+            for content in asyncio.run(
+                _list_repo_contents(remote_repo.repo.full_name, remote_repo.sha)
+            )
         ]
-        files = [
-            f
-            for f in files
-            if not any(fnmatch.fnmatch(f, pattern) for pattern in ignore_patterns)
-            and f.lower() != "readme.md"
+    else:
+        entries = [
+            (entry_path, entry_type == "tree")
+            for entry_path, entry_type in remote_repo.tree
         ]
 
-        for file_name in files:
-            if file_name.lower() == "readme.md":
+    structure_parts = []
+    for entry_path, is_dir in entries:
+        if is_dir:
+            structure_parts.append(f"/{entry_path}/\n")
+        else:
+            structure_parts.append(f"/{entry_path}\n")
+    return "".join(structure_parts)
+
+
+def _scandir_walk(directory_path, ignore_rules):
+    """
+    Top-down os.walk equivalent built on os.scandir, yielding (dirs, files)
+    lists of (relative path, DirEntry) pairs. The .git folder and entries
+    matched by ignore_rules are dropped; symlinked directories are not followed.
+    """
+    dirs_to_visit = [(directory_path, "")]
+
+    while dirs_to_visit:
+        current, prefix = dirs_to_visit.pop()
+        try:
+            with os.scandir(current) as it:
+                entries = list(it)
+        except OSError:
+            continue  # Unreadable or vanished, skipped like os.walk does
+
+        dirs = []
+        files = []
+        for entry in entries:
+            name = entry.name
+            is_dir = entry.is_dir()
+            if is_dir:
+                name_re, path_re = ignore_rules.dir_name, ignore_rules.dir_path
+            else:
+                name_re, path_re = ignore_rules.name, ignore_rules.path
+            if name_re.match(name):
+                continue
+            relative_path = prefix + name
+            if path_re.match(relative_path):
                 continue
-            file_path = os.path.join(root, file_name)
-            relative_path = os.path.relpath(file_path, path)
+            if is_dir:
+                if name != ".git":
+                    dirs.append((relative_path, entry))
+            else:
+                files.append((relative_path, entry))
+        yield dirs, files
 
-            content_descriptor = f"File: {relative_path}\n"
-            file_extension = os.path.splitext(file_name)[1]
-            if file_extension in BINARY_EXTENSIONS:
-                file_contents_list.append(
-                    content_descriptor + "Content: Skipped binary file\n\n"
-                )
+        dirs_to_visit.extend(
+            (entry.path, relative_path + "/")
+            for relative_path, entry in reversed(dirs)
+            if entry.is_dir(follow_symlinks=False)
+        )
+
+
+# remote marks a clone whose output is formatted like the GitHub API path
+LocalRepo = namedtuple("LocalRepo", ["path", "structure", "files", "remote"])
+
+
+def walk_local(path):
+    """
+    Walk a local directory once, excluding the .git folder and accounting for
+    .gptignore, and collect both the structure listing and the files whose
+    contents should be emitted as (relative path, full path, is binary) tuples.
+    """
+    ignore_rules = parse_ignore_patterns(path)
+    structure_parts = []
+    files = []
+    for dirs, dir_files in _scandir_walk(path, ignore_rules):
+        for relative_path, _ in dirs:
+            structure_parts.append(f"{relative_path}/\n")
+
+        for relative_path, entry in dir_files:
+            structure_parts.append(f"{relative_path}\n")
+            name_lc = entry.name.lower()
+            if name_lc != "readme.md":
+                files.append((relative_path, entry.path, is_binary_file(name_lc)))
+    return LocalRepo(path, "".join(structure_parts), files, False)
+
+
+def walk_clone(directory):
+    """
+    List a fresh clone from its git tree rather than the filesystem, so the
+    output matches the API path: the same entry order, "/"-prefixed paths,
+    submodules and symlinks listed but not read, and no ignore-file filtering.
+    """
+    listing = subprocess.run(
+        ["git", "-C", directory, "ls-tree", "-r", "-t", "-z", "--full-tree", "HEAD"],
+        stdout=subprocess.PIPE,
+        check=True,
+    ).stdout
+    structure_parts = []
+    files = []
+    for record in listing.split(b"\0"):
+        if not record:
+            continue
+        meta, path = record.split(b"\t", 1)
+        mode, kind, _ = meta.split()
+        path = os.fsdecode(path)
+        if kind == b"tree":
+            structure_parts.append(f"/{path}/\n")
+            continue
+
+        structure_parts.append(f"/{path}\n")
+        name_lc = path.rsplit("/", 1)[-1].lower()
+        if kind == b"blob" and mode != b"120000" and name_lc != "readme.md":
+            files.append(
+                (f"/{path}", os.path.join(directory, path), is_binary_file(name_lc))
+            )
+    return LocalRepo(directory, "".join(structure_parts), files, True)
+
+
+def get_local_repo_structure(local_repo):
+    """
+    Generate the structure of a local directory, excluding the .git folder, README file and accounting for .gptignore.
+    """
+    return local_repo.structure
+
+
+def get_file_contents(remote_repo, write: Callable[[str], None], pbar: tqdm):
+    """
+    Stream file contents from a single tarball download of the repository,
+    replacing one API request per file. Like local files, the first
+    BINARY_PROBE_SIZE bytes are checked for NUL bytes before the rest is read
+    and decoded.
+    """
+    repo = remote_repo.repo
+    if not remote_repo.truncated:
+        pbar.reset(total=sum(1 for _, kind in remote_repo.tree if kind == "blob"))
+    files = _iter_repo_tarball(repo.full_name, remote_repo.sha)
+    for file_path, file_size, fileobj in files:
+        pbar.update()
+        name_lc = file_path.rsplit("/", 1)[-1].lower()
+        if name_lc == "readme.md":
+            continue
+
+        content_descriptor = f"File: /{file_path}\n"
+        if is_binary_file(name_lc):
+            write(content_descriptor + "Content: Skipped binary file\n\n")
+        elif file_size > SETTINGS.max_file_bytes:
+            write(
+                content_descriptor
+                + f"Content: Skipped file larger than {SETTINGS.max_file_bytes} bytes ({file_size} bytes)\n\n"
+            )
+        else:
+            head = fileobj.read(BINARY_PROBE_SIZE)
+            if b"\x00" in head:
+                write(content_descriptor + "Content: Skipped binary file\n\n")
             else:
-                try:
-                    with open(file_path, "r", encoding="utf-8") as f:
-                        content = f.read()
-                    file_contents_list.append(
-                        content_descriptor + f"Content:\n{content}\n\n"
-                    )
-                except UnicodeDecodeError:
-                    try:
-                        with open(file_path, "r", encoding="latin-1") as f:
-                            content = f.read()
-                        file_contents_list.append(
-                            content_descriptor
-                            + f"Content (Latin-1 Decoded):\n{content}\n\n"
-                        )
-                    except UnicodeDecodeError:
-                        file_contents_list.append(
-                            content_descriptor
-                            + "Content: Skipped due to unsupported encoding\n\n"
-                        )
-                except Exception as e:
-                    file_contents_list.append(
-                        content_descriptor
-                        + f"Content: Skipped due to error: {str(e)}\n\n"
-                    )
+                write(
+                    content_descriptor + _remote_content_section(head + fileobj.read())
+                )
+
+
+def _local_content_section(data) -> str:
+    """
+    Decode a bytes-like object (bytes or mmap) as a Content section, falling back to Latin-1.
+    """
+    try:
+        content = str(data, "utf-8")
+        label = "Content"
+    except UnicodeDecodeError:
+        content = str(data, "latin-1")
+        label = "Content (Latin-1 Decoded)"
+    if "\r" in content:
+        # Match the universal newline handling of text-mode reads
+        content = content.replace("\r\n", "\n").replace("\r", "\n")
+    return f"{label}:\n{content}\n\n"
+
+
+def _read_local_file(file_path, content_section=_local_content_section):
+    """
+    Read a single file and return its Content section, falling back to Latin-1.
+    Files over Settings.max_file_bytes or with a NUL in the first
+    BINARY_PROBE_SIZE bytes are skipped; files over MMAP_THRESHOLD are mapped.
+    """
+    try:
+        with open(file_path, "rb", buffering=0) as f:
+            file_size = os.fstat(f.fileno()).st_size
+            if file_size > SETTINGS.max_file_bytes:
+                return f"Content: Skipped file larger than {SETTINGS.max_file_bytes} bytes ({file_size} bytes)\n\n"
+            if file_size > MMAP_THRESHOLD:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    if mapped.find(b"\x00", 0, BINARY_PROBE_SIZE) != -1:
+                        return "Content: Skipped binary file\n\n"
+                    return content_section(mapped)
+            data = bytearray(file_size)
+            with memoryview(data) as view:
+                length = f.readinto(view[:BINARY_PROBE_SIZE])
+                if data.find(b"\x00", 0, length) != -1:
+                    return "Content: Skipped binary file\n\n"
+                while length < file_size:  # readinto may return short reads
+                    read = f.readinto(view[length:])
+                    if not read:
+                        break
+                    length += read
+            del data[length:]  # The file shrank after fstat
+    except Exception as e:
+        return f"Content: Skipped due to error: {str(e)}\n\n"
+
+    return content_section(data)
+
+
+def get_local_file_contents(local_repo, write: Callable[[str], None], pbar: tqdm):
+    """
+    Generate the contents of files in a local directory, excluding the .git folder, README file and  also accounting for .gptignore.
+    Files are read on a thread pool at most MAX_PENDING_READS ahead of the
+    writer and passed to write in traversal order.
+    """
 
-    return "".join(file_contents_list)
+    def write_next():
+        content_descriptor, future = pending.popleft()
+        if future is None:
+            write(content_descriptor + "Content: Skipped binary file\n\n")
+        else:
+            write(content_descriptor + future.result())
+        pbar.update()
+
+    content_section = _local_content_section
+    if local_repo.remote:
+        content_section = _remote_content_section
+    pbar.reset(total=len(local_repo.files))
+    with ThreadPoolExecutor(max_workers=MAX_READ_WORKERS) as executor:
+        pending = deque()
+        for relative_path, file_path, is_binary in local_repo.files:
+            content_descriptor = f"File: {relative_path}\n"
+            future = None
+            if not is_binary:
+                future = executor.submit(_read_local_file, file_path, content_section)
+            pending.append((content_descriptor, future))
+            if len(pending) > MAX_PENDING_READS:
+                write_next()
+
+        while pending:
+            write_next()
+
+
+@functools.lru_cache(maxsize=None)
+def _load_template(prompt_path):
+    """
+    Read the prompt once and split it around its ##REPO_NAME## placeholders.
+    """
+    return tuple(Path(prompt_path).read_text(encoding="utf-8").split("##REPO_NAME##"))
 
 
 def get_instructions(prompt_path, repo_name):
-    with open(prompt_path, "r", encoding="utf-8") as f:
-        instructions = f.read()
-        instructions = instructions.replace("##REPO_NAME##", repo_name)
-        return instructions
+    return repo_name.join(_load_template(prompt_path))
+
+
+RepoFunctions = namedtuple(
+    "RepoFunctions", ["get_readme", "get_structure", "get_files"]
+)
+
+# Built once; indexed by is_local
+_REPO_FUNCTIONS = (
+    RepoFunctions(get_readme_content, get_repo_structure, get_file_contents),
+    RepoFunctions(
+        get_local_readme_content, get_local_repo_structure, get_local_file_contents
+    ),
+)
 
 
 def set_functions(is_local):
-    if is_local:
-        get_readme = get_local_readme_content
-        get_structure = get_local_repo_structure
-        get_files = get_local_file_contents
-    else:
-        get_readme = get_readme_content
-        get_structure = get_repo_structure
-        get_files = get_file_contents
+    return _REPO_FUNCTIONS[bool(is_local)]
+
+
+@functools.lru_cache(maxsize=None)
+def get_github_client(token: str):
+    """
+    Create the PyGithub client once per token and reuse it for later calls.
+    """
+    from github import Github
+
+    return Github(token)
 
-    return get_readme, get_structure, get_files
+
+def get_repo_name(repo_path_or_url):
+    return repo_path_or_url.split("/")[-1]
 
 
 def get_text(
     repo_path_or_url,
+    write: Callable[[str], None],
     is_local=False,
     no_prompt=False,
 ):
     """
     Main function to get repository contents.
+    The output is passed to write piece by piece rather than returned as one string.
+    GitHub repositories are shallow-cloned and read from disk when git is
+    available, with the GitHub API as the fallback; both produce the same output.
     """
-
-    (
-        get_readme,
-        get_structure,
-        get_files,
-    ) = set_functions(is_local)
-    repo_name = repo_path_or_url.split("/")[-1]
-    if is_local:
-        repo_or_path = repo_path_or_url
-    else:
-        if not GITHUB_TOKEN:
-            raise ValueError(
-                "Please set the 'GITHUB_TOKEN' environment variable or the 'GITHUB_TOKEN' in the script."
+    with ExitStack() as stack:
+        repo_name = get_repo_name(repo_path_or_url)
+        if is_local:
+            # One traversal feeds both the structure listing and the file contents
+            repo_or_path = walk_local(repo_path_or_url)
+        else:
+            full_name = repo_path_or_url.replace("https://github.com/", "")
+            clone_dir = stack.enter_context(
+                tempfile.TemporaryDirectory(ignore_cleanup_errors=True)
             )
-        g = Github(GITHUB_TOKEN)
-        repo_or_path = g.get_repo(repo_path_or_url.replace("https://github.com/", ""))
+            if _clone_repo(full_name, clone_dir):
+                is_local = True
+                repo_or_path = walk_clone(clone_dir)
+            else:
+                if not SETTINGS.github_token:
+                    raise ValueError(
+                        "Please set the 'GITHUB_TOKEN' environment variable or the 'GITHUB_TOKEN' in the script."
+                    )
+                g = get_github_client(SETTINGS.github_token)
+                repo = g.get_repo(full_name)
+                # One tree request feeds both the structure listing and the downloads
+                repo_or_path = walk_remote(repo)
 
-    print(f"Fetching README for: {repo_name}")
-    readme_content = get_readme(repo_or_path)
+        (
+            get_readme,
+            get_structure,
+            get_files,
+        ) = set_functions(is_local)
 
-    print(f"\nFetching repository structure for: {repo_name}")
-    repo_structure = f"Repository Structure: {repo_name}\n"
-    repo_structure += get_structure(repo_or_path)
+        instructions = ""
+        if not no_prompt:
+            instructions = get_instructions("instructions-prompt.txt", repo_name)
+        write(instructions)
 
-    print(f"\nFetching file contents for: {repo_name}")
-    file_contents = get_files(repo_or_path)
+        print(f"Fetching README for: {repo_name}")
+        readme_content = get_readme(repo_or_path)
+        write(f"\n\nREADME:\n{readme_content}\n\n")
 
-    instructions = ""
-    if not no_prompt:
-        instructions = get_instructions("instructions-prompt.txt", repo_name)
+        print(f"\nFetching repository structure for: {repo_name}")
+        write(f"Repository Structure: {repo_name}\n")
+        write(get_structure(repo_or_path))
+        write("\n\n")
 
-    text = f"{instructions}\n\nREADME:\n{readme_content}\n\n{repo_structure}\n\n{file_contents}"
+        print(f"\nFetching file contents for: {repo_name}")
+        # One bar for the whole contents phase, advanced once per file
+        with tqdm(desc="Processing", unit="file", leave=False) as pbar:
+            get_files(repo_or_path, write, pbar)
 
-    return repo_name, text
+    return repo_name
 
 
 @app.command()
@@ -368,23 +1058,23 @@ def analyze(
         help="GitHub Personal Access Token for GitHub repository analysis.",
     ),
     output_dir: Path = typer.Option(
-        Path(get_config_value("output_directory", "./")),
+        SETTINGS.output_directory,
         help="Directory to save the text output",
     ),
     save_to_file_option: bool = typer.Option(
-        get_config_value("save_to_file", True),
+        SETTINGS.save_to_file,
         "--save",
         "-s",
         help="Toggle whether to save the analysis result to a file",
     ),
     copy_to_clipboard_option: bool = typer.Option(
-        get_config_value("copy_to_clipboard", True),
+        SETTINGS.copy_to_clipboard,
         "--copy",
         "-c",
         help="Toggle whether to copy the analysis result to the clipboard",
     ),
     timestamp_option: bool = typer.Option(
-        get_config_value("timestamp_option", True),
+        SETTINGS.timestamp_option,
         "--time",
         "-t",
         help="Toggle whether to save file with timestamp",
@@ -402,23 +1092,42 @@ def analyze(
         )
         raise typer.Exit(code=1)
 
-    output = ""
     if is_github_repo_url(input_path):
-        set_functions(False)
-        repo_name, output = get_text(input_path, no_prompt=no_prompt)
+        is_local = False
     elif os.path.isdir(input_path):
-        repo_name, output = get_text(input_path, True, no_prompt=no_prompt)
+        is_local = True
     else:
         console.print(
             "[red]Invalid input. Please provide a valid local directory path or a full GitHub repository URL.[/red]"
         )
         raise typer.Exit(code=1)
 
+    # Output is encoded once and streamed to every enabled sink as it is
+    # produced; only the clipboard keeps the whole text, as one bytearray.
+    sinks = []
+    clipboard_buffer = bytearray()
     if copy_to_clipboard_option:
-        copy_to_clipboard(output)
+        sinks.append(clipboard_buffer.extend)
+
+    with ExitStack() as stack:
+        if save_to_file_option:
+            sinks.append(
+                stack.enter_context(
+                    save_to_file(
+                        get_repo_name(input_path), output_dir, timestamp_option
+                    )
+                )
+            )
+
+        def write(text):
+            data = text.encode("utf-8")
+            for sink in sinks:
+                sink(data)
 
-    if save_to_file_option:
-        save_to_file(output, repo_name, output_dir, timestamp_option)
+        get_text(input_path, write, is_local, no_prompt=no_prompt)
+
+    if copy_to_clipboard_option:
+        copy_to_clipboard(clipboard_buffer)
 
 
 if __name__ == "__main__":